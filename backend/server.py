@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, File, UploadFile, HTTPException
+from fastapi import FastAPI, APIRouter, File, Form, UploadFile, HTTPException
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -14,6 +14,10 @@ import io
 import re
 import requests
 import json
+import asyncio
+import hashlib
+from collections import deque
+from PIL import Image
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -36,6 +40,22 @@ GOOGLE_VISION_URL = f"https://vision.googleapis.com/v1/images:annotate?key={GOOG
 # Parking Configuration
 HOURLY_RATE = 20  # ₹20 per hour
 
+# Gate recognition session configuration
+CONSENSUS_WINDOW = 5  # Recent OCR readings kept per gate
+CONSENSUS_MIN_READINGS = 2  # Readings needed before a plate can be confirmed
+CONSENSUS_AGREEMENT = 0.6  # Minimum weighted vote share for every character position
+SCENE_THUMBNAIL_SIZE = (32, 24)
+SCENE_CHANGE_THRESHOLD = 12.0  # Mean grayscale difference (0-255) that counts as a new scene
+CONFIRM_COOLDOWN_SECONDS = 30  # Do not re-emit the same plate for a gate within this window
+SESSION_IDLE_SECONDS = 60  # Drop a gate's session after this long without frames
+
+# Recognition event log configuration
+EVENT_LOG_QUEUE_SIZE = int(os.environ.get('EVENT_LOG_QUEUE_SIZE', 10000))
+EVENT_LOG_FLUSH_SIZE = int(os.environ.get('EVENT_LOG_FLUSH_SIZE', 200))
+EVENT_LOG_FLUSH_INTERVAL = float(os.environ.get('EVENT_LOG_FLUSH_INTERVAL', 2.0))  # seconds
+EVENT_LOG_OVERFLOW_POLICY = os.environ.get('EVENT_LOG_OVERFLOW_POLICY', 'drop_oldest')  # drop_oldest, drop_newest, block
+EVENT_LOG_BLOCK_TIMEOUT = float(os.environ.get('EVENT_LOG_BLOCK_TIMEOUT', 0.05))  # seconds, for the block policy
+
 # Define Models
 class ParkingRecord(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -56,6 +76,22 @@ class OCRResult(BaseModel):
     vehicle_number: Optional[str] = None
     confidence: float = 0.0
     all_text: List[str] = []
+    gate: Optional[str] = None
+    confirmed_plate: Optional[str] = None
+    ocr_skipped: bool = False
+    already_confirmed: bool = False  # Re-confirmed a plate already emitted within the cooldown
+    mock: bool = False  # Produced by the demo fallback, not by Vision
+
+class RecognitionEvent(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    gate: Optional[str] = None
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    frame_hash: str
+    candidates: List[str] = []
+    confidence: float = 0.0
+    vehicle_number: Optional[str] = None
+    confirmed_plate: Optional[str] = None
+    mock: bool = False  # Demo fallback reading, not a real Vision result
 
 def extract_license_plate_text(texts):
     """Extract potential license plate text from OCR results"""
@@ -119,67 +155,350 @@ async def mock_ocr_analyze(image_content: bytes) -> OCRResult:
     return OCRResult(
         vehicle_number=mock_plate,
         confidence=0.8,
-        all_text=[mock_plate, "MOCK", "OCR", "DEMO"]
+        all_text=[mock_plate, "MOCK", "OCR", "DEMO"],
+        mock=True
     )
 
+async def vision_ocr_analyze(image_base64: str) -> OCRResult:
+    """Analyze a base64 image for license plate using Google Vision API"""
+    try:
+        # Prepare request for Google Vision API
+        request_data = {
+            "requests": [
+                {
+                    "image": {
+                        "content": image_base64
+                    },
+                    "features": [
+                        {
+                            "type": "TEXT_DETECTION",
+                            "maxResults": 10
+                        }
+                    ]
+                }
+            ]
+        }
+        
+        # Call Google Vision API
+        response = requests.post(GOOGLE_VISION_URL, json=request_data)
+        
+        if response.status_code == 200:
+            result = response.json()
+            
+            # Extract text annotations
+            text_annotations = []
+            all_text = []
+            
+            if 'responses' in result and result['responses']:
+                annotations = result['responses'][0].get('textAnnotations', [])
+                for annotation in annotations:
+                    text_annotations.append(annotation)
+                    all_text.append(annotation.get('description', ''))
+            
+            # Extract license plate
+            vehicle_number, confidence = extract_license_plate_text(text_annotations)
+            
+            return OCRResult(
+                vehicle_number=vehicle_number,
+                confidence=confidence,
+                all_text=all_text
+            )
+        else:
+            raise Exception(f"Google Vision API error: {response.text}")
+            
+    except Exception as vision_error:
+        # Fallback to mock OCR for demo purposes
+        print(f"Google Vision API failed: {vision_error}")
+        return await mock_ocr_analyze(base64.b64decode(image_base64))
+
+def frame_signature(image_content: bytes) -> Optional[List[int]]:
+    """Reduce a frame to a small grayscale thumbnail for cheap scene comparison"""
+    try:
+        image = Image.open(io.BytesIO(image_content))
+        # Let the JPEG decoder downscale while decoding instead of after
+        image.draft('L', SCENE_THUMBNAIL_SIZE)
+        image = image.convert('L').resize(SCENE_THUMBNAIL_SIZE)
+        return list(image.tobytes())
+    except Exception:
+        return None
+
+def scene_changed(reference: Optional[List[int]], current: Optional[List[int]]) -> bool:
+    """Check whether two frame signatures differ by more than the scene threshold"""
+    if reference is None or current is None or len(reference) != len(current):
+        return True
+    mean_diff = sum(abs(a - b) for a, b in zip(reference, current)) / len(current)
+    return mean_diff > SCENE_CHANGE_THRESHOLD
+
+class GateSession:
+    """Recognition state for a single gate camera"""
+
+    def __init__(self):
+        self.readings = deque(maxlen=CONSENSUS_WINDOW)
+        self.confirmed_plate: Optional[str] = None
+        self.confirmed_confidence = 0.0
+        self.reference_frame: Optional[List[int]] = None
+        self.last_seen = datetime.utcnow()
+        # Survive reset() so a re-read of the same vehicle is not emitted twice
+        self.last_confirmed_plate: Optional[str] = None
+        self.last_confirmed_at: Optional[datetime] = None
+
+    def reset(self):
+        self.readings.clear()
+        self.confirmed_plate = None
+        self.confirmed_confidence = 0.0
+        self.reference_frame = None
+
+    def add_reading(self, result: OCRResult):
+        if result.vehicle_number:
+            self.readings.append((result.vehicle_number, result.confidence))
+
+    def consensus(self) -> tuple:
+        """Vote on each character position, weighted by OCR confidence
+
+        Returns (plate, agreement, confidence): agreement is the weakest
+        per-position vote share, confidence the mean OCR confidence of the
+        readings that took part in the vote.
+        """
+        if len(self.readings) < CONSENSUS_MIN_READINGS:
+            return None, 0.0, 0.0
+
+        # Only plates of the most supported length can be aligned position by position
+        length_weights = {}
+        for plate, confidence in self.readings:
+            length_weights[len(plate)] = length_weights.get(len(plate), 0.0) + confidence
+        plate_length = max(length_weights, key=length_weights.get)
+        aligned = [(plate, conf) for plate, conf in self.readings if len(plate) == plate_length]
+        if len(aligned) < CONSENSUS_MIN_READINGS:
+            return None, 0.0, 0.0
+
+        total_weight = sum(conf for _, conf in aligned)
+        if total_weight <= 0:
+            return None, 0.0, 0.0
+        confidence = total_weight / len(aligned)
+
+        characters = []
+        agreement = 1.0
+        for position in range(plate_length):
+            votes = {}
+            for plate, conf in aligned:
+                votes[plate[position]] = votes.get(plate[position], 0.0) + conf
+            character = max(votes, key=votes.get)
+            characters.append(character)
+            agreement = min(agreement, votes[character] / total_weight)
+
+        if agreement < CONSENSUS_AGREEMENT:
+            return None, agreement, confidence
+        return ''.join(characters), agreement, confidence
+
+    def confirm(self, plate: str, confidence: float, frame: Optional[List[int]], now: datetime) -> bool:
+        """Lock the session on a plate; returns False if it repeats a recent confirmation"""
+        repeated = (
+            plate == self.last_confirmed_plate
+            and self.last_confirmed_at is not None
+            and now - self.last_confirmed_at < timedelta(seconds=CONFIRM_COOLDOWN_SECONDS)
+        )
+        self.confirmed_plate = plate
+        self.confirmed_confidence = confidence
+        self.reference_frame = frame
+        self.readings.clear()
+        self.last_confirmed_plate = plate
+        self.last_confirmed_at = now
+        return not repeated
+
+gate_sessions = {}
+
+def prune_gate_sessions(now: datetime):
+    """Drop sessions for gates that have stopped sending frames"""
+    idle = timedelta(seconds=SESSION_IDLE_SECONDS)
+    for gate in [gate for gate, session in gate_sessions.items() if now - session.last_seen > idle]:
+        del gate_sessions[gate]
+
+class RecognitionEventLog:
+    """Bounded write-behind queue of recognition events, batch-inserted by a background task"""
+
+    def __init__(self, collection, max_size: int, flush_size: int, flush_interval: float, overflow_policy: str,
+                 block_timeout: float = EVENT_LOG_BLOCK_TIMEOUT):
+        if overflow_policy not in ("drop_oldest", "drop_newest", "block"):
+            raise ValueError(f"Unknown event log overflow policy: {overflow_policy}")
+        if max_size < 1:
+            raise ValueError(f"Event log queue size must be at least 1, got {max_size}")
+        if flush_size < 1:
+            raise ValueError(f"Event log flush size must be at least 1, got {flush_size}")
+        if flush_interval <= 0:
+            raise ValueError(f"Event log flush interval must be positive, got {flush_interval}")
+        self.collection = collection
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.closed = False
+        self._dropped_reported = 0
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def record(self, event: RecognitionEvent):
+        """Queue an event without waiting on the database"""
+        # Nothing drains the queue after stop(), so late events are counted as dropped
+        if self.closed:
+            self.dropped += 1
+            return
+
+        document = event.dict()
+        try:
+            self.queue.put_nowait(document)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == "block":
+            try:
+                await asyncio.wait_for(self.queue.put(document), timeout=self.block_timeout)
+                return
+            except asyncio.TimeoutError:
+                pass
+        elif self.overflow_policy == "drop_oldest":
+            self.queue.get_nowait()
+            self.queue.put_nowait(document)
+            self.dropped += 1
+            return
+
+        self.dropped += 1
+
+    async def _next_document(self, timeout: float):
+        """Wait for the next queued document, giving up on timeout or stop()"""
+        get = asyncio.ensure_future(self.queue.get())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        done, pending = await asyncio.wait({get, stopping}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        return get.result() if get in done else None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            document = await self._next_document(self.flush_interval)
+            if document is None:
+                continue
+
+            # Collect a batch until it is full or the flush interval runs out
+            batch = [document]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                document = await self._next_document(remaining)
+                if document is None:
+                    break
+                batch.append(document)
+
+            await self._write(batch)
+            self._report_dropped()
+
+    def _report_dropped(self):
+        if self.dropped > self._dropped_reported:
+            logger.warning(
+                f"Recognition event log dropped {self.dropped - self._dropped_reported} events "
+                f"({self.dropped} total)"
+            )
+            self._dropped_reported = self.dropped
+
+    async def _write(self, batch: list):
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to persist {len(batch)} recognition events: {e}")
+
+    async def stop(self):
+        """Stop the background task and flush everything still queued"""
+        self.closed = True
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+
+        while not self.queue.empty():
+            batch = []
+            while len(batch) < self.flush_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self._write(batch)
+
+        self._report_dropped()
+
+recognition_log: Optional[RecognitionEventLog] = None
+
+async def record_recognition_event(gate: Optional[str], image_content: bytes, result: OCRResult):
+    if recognition_log is None:
+        return
+    await recognition_log.record(RecognitionEvent(
+        gate=gate,
+        frame_hash=hashlib.sha256(image_content).hexdigest(),
+        candidates=result.all_text,
+        confidence=result.confidence,
+        vehicle_number=result.vehicle_number,
+        confirmed_plate=result.confirmed_plate,
+        mock=result.mock
+    ))
+
+async def analyze_gate_frame(gate: Optional[str], image_base64: str, image_content: bytes) -> OCRResult:
+    """Run OCR for a gate frame, voting across recent frames to confirm the plate"""
+    if not gate:
+        result = await vision_ocr_analyze(image_base64)
+        await record_recognition_event(gate, image_content, result)
+        return result
+
+    now = datetime.utcnow()
+    prune_gate_sessions(now)
+    session = gate_sessions.setdefault(gate, GateSession())
+    session.last_seen = now
+
+    frame = frame_signature(image_content)
+
+    # Plate already confirmed for this scene: skip OCR until the vehicle moves
+    if session.confirmed_plate:
+        if not scene_changed(session.reference_frame, frame):
+            return OCRResult(
+                vehicle_number=session.confirmed_plate,
+                confidence=session.confirmed_confidence,
+                gate=gate,
+                ocr_skipped=True
+            )
+        session.reset()
+
+    result = await vision_ocr_analyze(image_base64)
+    result.gate = gate
+
+    # Demo fallback plates are random per call and must not enter the vote
+    if result.mock:
+        await record_recognition_event(gate, image_content, result)
+        return result
+
+    session.add_reading(result)
+
+    plate, _, confidence = session.consensus()
+    if plate:
+        if session.confirm(plate, confidence, frame, now):
+            result.confirmed_plate = plate
+        else:
+            result.already_confirmed = True
+    await record_recognition_event(gate, image_content, result)
+    return result
+
 @api_router.post("/ocr/analyze", response_model=OCRResult)
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(file: UploadFile = File(...), gate: Optional[str] = Form(None)):
     """Analyze uploaded image for license plate using Google Vision API"""
     try:
         # Read image file
         contents = await file.read()
         image_base64 = base64.b64encode(contents).decode('utf-8')
-        
-        # Try Google Vision API first
-        try:
-            # Prepare request for Google Vision API
-            request_data = {
-                "requests": [
-                    {
-                        "image": {
-                            "content": image_base64
-                        },
-                        "features": [
-                            {
-                                "type": "TEXT_DETECTION",
-                                "maxResults": 10
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-            # Call Google Vision API
-            response = requests.post(GOOGLE_VISION_URL, json=request_data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Extract text annotations
-                text_annotations = []
-                all_text = []
-                
-                if 'responses' in result and result['responses']:
-                    annotations = result['responses'][0].get('textAnnotations', [])
-                    for annotation in annotations:
-                        text_annotations.append(annotation)
-                        all_text.append(annotation.get('description', ''))
-                
-                # Extract license plate
-                vehicle_number, confidence = extract_license_plate_text(text_annotations)
-                
-                return OCRResult(
-                    vehicle_number=vehicle_number,
-                    confidence=confidence,
-                    all_text=all_text
-                )
-            else:
-                raise Exception(f"Google Vision API error: {response.text}")
-                
-        except Exception as vision_error:
-            # Fallback to mock OCR for demo purposes
-            print(f"Google Vision API failed: {vision_error}")
-            return await mock_ocr_analyze(contents)
+        return await analyze_gate_frame(gate, image_base64, contents)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR analysis failed: {str(e)}")
@@ -188,58 +507,8 @@ async def analyze_image(file: UploadFile = File(...)):
 async def analyze_image_base64(data: dict):
     """Analyze base64 image for license plate using Google Vision API"""
     try:
-        # Try Google Vision API first
-        try:
-            # Prepare request for Google Vision API
-            request_data = {
-                "requests": [
-                    {
-                        "image": {
-                            "content": data['image']
-                        },
-                        "features": [
-                            {
-                                "type": "TEXT_DETECTION",
-                                "maxResults": 10
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-            # Call Google Vision API
-            response = requests.post(GOOGLE_VISION_URL, json=request_data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Extract text annotations
-                text_annotations = []
-                all_text = []
-                
-                if 'responses' in result and result['responses']:
-                    annotations = result['responses'][0].get('textAnnotations', [])
-                    for annotation in annotations:
-                        text_annotations.append(annotation)
-                        all_text.append(annotation.get('description', ''))
-                
-                # Extract license plate
-                vehicle_number, confidence = extract_license_plate_text(text_annotations)
-                
-                return OCRResult(
-                    vehicle_number=vehicle_number,
-                    confidence=confidence,
-                    all_text=all_text
-                )
-            else:
-                raise Exception(f"Google Vision API error: {response.text}")
-                
-        except Exception as vision_error:
-            # Fallback to mock OCR for demo purposes
-            print(f"Google Vision API failed: {vision_error}")
-            # Convert base64 to bytes for mock analysis
-            image_bytes = base64.b64decode(data['image'])
-            return await mock_ocr_analyze(image_bytes)
+        image_bytes = base64.b64decode(data['image'])
+        return await analyze_gate_frame(data.get('gate'), data['image'], image_bytes)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR analysis failed: {str(e)}")
@@ -395,6 +664,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_recognition_log():
+    global recognition_log
+    recognition_log = RecognitionEventLog(
+        db.recognition_events,
+        max_size=EVENT_LOG_QUEUE_SIZE,
+        flush_size=EVENT_LOG_FLUSH_SIZE,
+        flush_interval=EVENT_LOG_FLUSH_INTERVAL,
+        overflow_policy=EVENT_LOG_OVERFLOW_POLICY
+    )
+    recognition_log.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if recognition_log is not None:
+        await recognition_log.stop()
     client.close()
\ No newline at end of file
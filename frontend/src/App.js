@@ -11,6 +11,7 @@ const CameraComponent = ({ title, mode, onProcessVehicle, disabled }) => {
   const [isStreaming, setIsStreaming] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [status, setStatus] = useState(null);
   const [lastCapture, setLastCapture] = useState(null);
 
   // Start camera stream
@@ -50,6 +51,7 @@ const CameraComponent = ({ title, mode, onProcessVehicle, disabled }) => {
 
     setLoading(true);
     setError(null);
+    setStatus(null);
 
     try {
       const canvas = canvasRef.current;
@@ -68,12 +70,20 @@ const CameraComponent = ({ title, mode, onProcessVehicle, disabled }) => {
 
       // Process OCR
       const response = await axios.post(`${API}/ocr/analyze-base64`, {
-        image: base64Data
+        image: base64Data,
+        gate: mode
       });
 
-      if (response.data.vehicle_number) {
-        await onProcessVehicle(response.data.vehicle_number, mode);
-      } else {
+      // Only act once the gate session has confirmed the plate across frames;
+      // demo fallback plates bypass the gate session and are used as-is
+      const plate = response.data.confirmed_plate ||
+        (response.data.mock ? response.data.vehicle_number : null);
+
+      if (plate) {
+        await onProcessVehicle(plate, mode);
+      } else if (response.data.vehicle_number && !response.data.ocr_skipped && !response.data.already_confirmed) {
+        setStatus(`Reading plate ${response.data.vehicle_number}, hold steady to confirm...`);
+      } else if (!response.data.vehicle_number) {
         setError('No license plate detected. Please try again.');
       }
 
@@ -130,6 +140,12 @@ const CameraComponent = ({ title, mode, onProcessVehicle, disabled }) => {
         </div>
       )}
 
+      {status && (
+        <div className="status-message">
+          🔎 {status}
+        </div>
+      )}
+
       <div className="camera-feed">
         {isStreaming && (
           <video 
@@ -0,0 +1,184 @@
+import io
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import server
+from server import GateSession, OCRResult, frame_signature, scene_changed
+
+
+def reading(plate, confidence):
+    return OCRResult(vehicle_number=plate, confidence=confidence)
+
+
+def jpeg_frame(color=(120, 120, 120), plate_box=None, noise=0):
+    image = Image.new('RGB', (640, 480), color)
+    draw = ImageDraw.Draw(image)
+    if plate_box:
+        draw.rectangle(plate_box, fill=(250, 250, 250))
+    if noise:
+        # Sparse speckle, like sensor noise between two captures
+        for x in range(0, 640, 16):
+            for y in range(0, 480, 16):
+                draw.point((x, y), fill=tuple(min(255, c + noise) for c in color))
+    buffered = io.BytesIO()
+    image.save(buffered, format='JPEG')
+    return buffered.getvalue()
+
+
+class GateSessionConsensusTest(unittest.TestCase):
+    def test_weighted_majority_outvotes_misread(self):
+        session = GateSession()
+        session.add_reading(reading("MH12AB1234", 0.9))
+        session.add_reading(reading("MH12A81234", 0.7))
+        session.add_reading(reading("MH12AB1234", 0.9))
+
+        plate, agreement, confidence = session.consensus()
+
+        self.assertEqual(plate, "MH12AB1234")
+        self.assertAlmostEqual(agreement, 1.8 / 2.5)
+        self.assertAlmostEqual(confidence, 2.5 / 3)
+
+    def test_minority_length_is_left_out_of_the_vote(self):
+        session = GateSession()
+        session.add_reading(reading("MH12AB1234", 0.9))
+        session.add_reading(reading("MH12A1234", 0.7))
+        session.add_reading(reading("MH12AB1234", 0.9))
+
+        plate, agreement, confidence = session.consensus()
+
+        self.assertEqual(plate, "MH12AB1234")
+        self.assertEqual(agreement, 1.0)
+        self.assertAlmostEqual(confidence, 0.9)
+
+    def test_length_mismatch_without_enough_aligned_readings(self):
+        session = GateSession()
+        session.add_reading(reading("MH12AB1234", 0.9))
+        session.add_reading(reading("MH12A1234", 0.7))
+
+        self.assertEqual(session.consensus(), (None, 0.0, 0.0))
+
+    def test_too_few_readings(self):
+        session = GateSession()
+        for _ in range(server.CONSENSUS_MIN_READINGS - 1):
+            session.add_reading(reading("MH12AB1234", 0.9))
+
+        self.assertEqual(session.consensus(), (None, 0.0, 0.0))
+
+    def test_empty_readings_are_ignored(self):
+        session = GateSession()
+        session.add_reading(reading("MH12AB1234", 0.9))
+        session.add_reading(OCRResult())
+
+        self.assertEqual(len(session.readings), 1)
+
+    def test_agreement_below_threshold(self):
+        session = GateSession()
+        session.add_reading(reading("MH12AB1234", 0.9))
+        session.add_reading(reading("KA05CD9876", 0.9))
+
+        plate, agreement, _ = session.consensus()
+
+        self.assertIsNone(plate)
+        self.assertLess(agreement, server.CONSENSUS_AGREEMENT)
+
+    def test_confirm_suppresses_repeat_within_cooldown(self):
+        session = GateSession()
+        now = datetime.utcnow()
+
+        self.assertTrue(session.confirm("MH12AB1234", 0.9, None, now))
+        session.reset()
+        self.assertFalse(session.confirm("MH12AB1234", 0.9, None, now + timedelta(seconds=5)))
+        self.assertTrue(session.confirm("KA05CD9876", 0.9, None, now + timedelta(seconds=6)))
+
+        later = now + timedelta(seconds=server.CONFIRM_COOLDOWN_SECONDS + 10)
+        self.assertTrue(session.confirm("KA05CD9876", 0.9, None, later))
+
+    def test_idle_sessions_are_pruned(self):
+        now = datetime.utcnow()
+        server.gate_sessions.clear()
+        server.gate_sessions["entry"] = GateSession()
+        server.gate_sessions["stale"] = GateSession()
+        server.gate_sessions["entry"].last_seen = now
+        server.gate_sessions["stale"].last_seen = now - timedelta(seconds=server.SESSION_IDLE_SECONDS + 1)
+
+        server.prune_gate_sessions(now)
+
+        self.assertEqual(list(server.gate_sessions), ["entry"])
+        server.gate_sessions.clear()
+
+
+class AnalyzeGateFrameTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        server.gate_sessions.clear()
+
+    def tearDown(self):
+        server.gate_sessions.clear()
+
+    async def analyze(self, frame):
+        return await server.analyze_gate_frame("entry", "", frame)
+
+    async def test_reconfirmed_plate_is_marked_already_confirmed(self):
+        car = jpeg_frame(plate_box=(200, 300, 440, 360))
+        moved = jpeg_frame(color=(20, 20, 20), plate_box=(220, 300, 460, 360))
+        vision = AsyncMock(side_effect=lambda _: reading("MH12AB1234", 0.9))
+
+        with patch.object(server, "vision_ocr_analyze", vision):
+            self.assertIsNone((await self.analyze(car)).confirmed_plate)
+            confirmed = await self.analyze(car)
+            skipped = await self.analyze(car)
+            # The car creeps forward: the scene changes and the same plate is read again
+            still_voting = await self.analyze(moved)
+            repeated = await self.analyze(moved)
+
+        self.assertEqual(confirmed.confirmed_plate, "MH12AB1234")
+        self.assertTrue(skipped.ocr_skipped)
+        self.assertFalse(still_voting.already_confirmed)
+        self.assertIsNone(repeated.confirmed_plate)
+        self.assertTrue(repeated.already_confirmed)
+        self.assertEqual(vision.await_count, 4)
+
+    async def test_mock_readings_bypass_the_vote(self):
+        vision = AsyncMock(return_value=OCRResult(vehicle_number="MH12AB1234", confidence=0.8, mock=True))
+
+        with patch.object(server, "vision_ocr_analyze", vision):
+            for _ in range(3):
+                result = await self.analyze(jpeg_frame())
+
+        self.assertTrue(result.mock)
+        self.assertIsNone(result.confirmed_plate)
+        self.assertEqual(len(server.gate_sessions["entry"].readings), 0)
+
+
+class SceneChangeTest(unittest.TestCase):
+    def test_identical_frames(self):
+        frame = frame_signature(jpeg_frame())
+
+        self.assertEqual(len(frame), server.SCENE_THUMBNAIL_SIZE[0] * server.SCENE_THUMBNAIL_SIZE[1])
+        self.assertFalse(scene_changed(frame, frame_signature(jpeg_frame())))
+
+    def test_slightly_noisy_frames(self):
+        reference = frame_signature(jpeg_frame())
+
+        self.assertFalse(scene_changed(reference, frame_signature(jpeg_frame(noise=40))))
+
+    def test_different_frames(self):
+        reference = frame_signature(jpeg_frame(plate_box=(200, 300, 440, 360)))
+
+        self.assertTrue(scene_changed(reference, frame_signature(jpeg_frame(color=(20, 20, 20)))))
+
+    def test_undecodable_frame(self):
+        reference = frame_signature(jpeg_frame())
+
+        self.assertIsNone(frame_signature(b"not an image"))
+        self.assertTrue(scene_changed(reference, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
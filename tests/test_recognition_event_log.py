@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import server
+from server import OCRResult, RecognitionEvent, RecognitionEventLog
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.batches.append([document["frame_hash"] for document in documents])
+
+    @property
+    def written(self):
+        return [frame_hash for batch in self.batches for frame_hash in batch]
+
+
+def event(n):
+    return RecognitionEvent(gate="entry", frame_hash=str(n))
+
+
+class RecognitionEventLogTest(unittest.IsolatedAsyncioTestCase):
+    def make_log(self, max_size=100, flush_size=3, flush_interval=0.05, overflow_policy="drop_oldest", **kwargs):
+        self.collection = FakeCollection()
+        return RecognitionEventLog(
+            self.collection,
+            max_size=max_size,
+            flush_size=flush_size,
+            flush_interval=flush_interval,
+            overflow_policy=overflow_policy,
+            **kwargs
+        )
+
+    async def test_flush_by_size(self):
+        log = self.make_log(flush_size=3, flush_interval=5.0)
+        log.start()
+        for n in range(3):
+            await log.record(event(n))
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.collection.batches, [["0", "1", "2"]])
+        await log.stop()
+
+    async def test_flush_by_interval(self):
+        log = self.make_log(flush_size=100, flush_interval=0.05)
+        log.start()
+        await log.record(event(0))
+        await log.record(event(1))
+        await asyncio.sleep(0.15)
+
+        self.assertEqual(self.collection.batches, [["0", "1"]])
+        await log.stop()
+
+    async def test_drop_oldest_keeps_newest(self):
+        log = self.make_log(max_size=3, overflow_policy="drop_oldest")
+        for n in range(5):
+            await log.record(event(n))
+
+        self.assertEqual(log.dropped, 2)
+        await log.stop()
+        self.assertEqual(self.collection.written, ["2", "3", "4"])
+
+    async def test_drop_newest_keeps_oldest(self):
+        log = self.make_log(max_size=3, overflow_policy="drop_newest")
+        for n in range(5):
+            await log.record(event(n))
+
+        self.assertEqual(log.dropped, 2)
+        await log.stop()
+        self.assertEqual(self.collection.written, ["0", "1", "2"])
+
+    async def test_block_times_out_and_drops(self):
+        log = self.make_log(max_size=1, overflow_policy="block", block_timeout=0.02)
+        await log.record(event(0))
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await log.record(event(1))
+
+        self.assertGreaterEqual(loop.time() - started, 0.02)
+        self.assertEqual(log.dropped, 1)
+        await log.stop()
+        self.assertEqual(self.collection.written, ["0"])
+
+    async def test_block_waits_for_space(self):
+        log = self.make_log(max_size=1, overflow_policy="block", block_timeout=1.0)
+        await log.record(event(0))
+        log.start()
+        await log.record(event(1))
+
+        self.assertEqual(log.dropped, 0)
+        await log.stop()
+        self.assertEqual(self.collection.written, ["0", "1"])
+
+    async def test_stop_flushes_everything_queued(self):
+        log = self.make_log(flush_size=2, flush_interval=5.0)
+        for n in range(5):
+            await log.record(event(n))
+        log.start()
+        await log.stop()
+
+        self.assertEqual(self.collection.written, ["0", "1", "2", "3", "4"])
+        self.assertTrue(all(len(batch) <= 2 for batch in self.collection.batches))
+
+    async def test_record_after_stop_is_counted_as_dropped(self):
+        log = self.make_log()
+        log.start()
+        await log.stop()
+        await log.record(event(0))
+
+        self.assertEqual(log.dropped, 1)
+        self.assertTrue(log.queue.empty())
+        self.assertEqual(self.collection.written, [])
+
+    async def test_mock_readings_are_marked(self):
+        log = self.make_log()
+        previous, server.recognition_log = server.recognition_log, log
+        try:
+            await server.record_recognition_event(
+                "entry", b"frame", OCRResult(vehicle_number="MH12AB1234", confidence=0.8, mock=True)
+            )
+            document = log.queue.get_nowait()
+        finally:
+            server.recognition_log = previous
+
+        self.assertTrue(document["mock"])
+        self.assertEqual(document["vehicle_number"], "MH12AB1234")
+
+    def test_unknown_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            self.make_log(overflow_policy="discard")
+
+    def test_queue_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self.make_log(max_size=0)
+
+    def test_flush_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self.make_log(flush_size=0)
+
+    def test_flush_interval_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self.make_log(flush_interval=0)
+
+
+if __name__ == '__main__':
+    unittest.main()